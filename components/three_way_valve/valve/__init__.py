@@ -1,4 +1,6 @@
+import math
 import re
+from types import MappingProxyType
 import esphome.codegen as cg
 import esphome.config_validation as cv
 from esphome.components import valve, stepper
@@ -18,6 +20,49 @@ CONF_PORTS = 'ports'
 CONF_POSITION_OFFSET = 'position_offset'
 CONF_MIXER_CURVE = 'mixer_curve'
 
+# Offset unit suffix -> canonical unit (based on servoxxd implementation)
+OFFSET_UNITS = {
+    "steps": "STEPS", "step": "STEPS",
+    "rev": "REVOLUTIONS", "revolutions": "REVOLUTIONS", "revolution": "REVOLUTIONS",
+    "deg": "DEGREES", "degrees": "DEGREES", "degree": "DEGREES", "°": "DEGREES",
+    "rad": "RADIANS", "radians": "RADIANS", "radian": "RADIANS",
+    "arcmin": "ARCMINUTES", "arcminute": "ARCMINUTES", "arcminutes": "ARCMINUTES",
+    "'": "ARCMINUTES", "amin": "ARCMINUTES",
+    "arcsec": "ARCSECONDS", "arcsecond": "ARCSECONDS", "arcseconds": "ARCSECONDS",
+    '"': "ARCSECONDS", "asec": "ARCSECONDS",
+}
+
+# Offset unit -> steps, called as (value, motor_steps_per_rev, gear_ratio,
+# steps_per_deg). Revolutions and radians count in motor direction, the angle
+# units follow the valve angle direction of steps_per_deg. Each formula keeps
+# its own evaluation order so int() truncates the offsets exactly as before.
+_OFFSET_TO_STEPS = {
+    "STEPS": lambda val, msr, gr, spd: val,
+    "REVOLUTIONS": lambda val, msr, gr, spd: val * msr * gr,
+    "DEGREES": lambda val, msr, gr, spd: val * spd,
+    # 1 revolution = 2π radians
+    "RADIANS": lambda val, msr, gr, spd: val / math.tau * msr * gr,
+    # 21600 arcminutes = 360 degrees
+    "ARCMINUTES": lambda val, msr, gr, spd: val / 21600.0 * 360.0 * spd,
+    # 1296000 arcseconds = 360 degrees
+    "ARCSECONDS": lambda val, msr, gr, spd: val / 1296000.0 * 360.0 * spd,
+}
+
+# "<number><unit>", longest suffixes first so "radians" wins over "rad"
+_OFFSET_RE = re.compile(
+    r"\s*(?P<num>.*?)\s*(?P<unit>"
+    + "|".join(re.escape(u) for u in sorted(OFFSET_UNITS, key=len, reverse=True))
+    + r")\s*",
+    re.IGNORECASE,
+)
+
+_OFFSET_UNIT_ERROR = (
+    "Position offset must end with a valid unit. "
+    "Supported units: steps, rev/revolutions, deg/degrees/°, "
+    "rad/radians, arcmin/arcminutes/', arcsec/arcseconds/\". "
+    "Example: 10steps, 0.5rev, 45deg, 1.57rad, 60arcmin, 3600arcsec"
+)
+
 def validate_position_offset(value):
     """Validate position offset with unit (like servoxxd).
     
@@ -28,33 +73,27 @@ def validate_position_offset(value):
     Example: "10steps" -> {"value": 10.0, "unit": "STEPS"}
     """
     value_str = cv.string(value).strip()
-    
-    # Parse unit suffixes (based on servoxxd implementation)
-    unit_map = {
-        ("steps", "step"): "STEPS",
-        ("rev", "revolutions", "revolution"): "REVOLUTIONS",
-        ("deg", "degrees", "degree", "°"): "DEGREES",
-        ("rad", "radians", "radian"): "RADIANS",
-        ("arcmin", "arcminute", "arcminutes", "'", "amin"): "ARCMINUTES",
-        ("arcsec", "arcsecond", "arcseconds", '"', "asec"): "ARCSECONDS",
-    }
-    
-    for suffixes, unit_type in unit_map.items():
-        for suffix in suffixes:
-            if value_str.lower().endswith(suffix.lower()):
-                value_part = value_str[:-len(suffix)].strip()
-                try:
-                    val = float(value_part)
-                except ValueError:
-                    raise cv.Invalid(f"Invalid number for offset: {value}")
-                return {"value": val, "unit": unit_type}
-    
-    raise cv.Invalid(
-        f"Position offset must end with a valid unit. "
-        f"Supported units: steps, rev/revolutions, deg/degrees/°, "
-        f"rad/radians, arcmin/arcminutes/', arcsec/arcseconds/\". "
-        f"Example: 10steps, 0.5rev, 45deg, 1.57rad, 60arcmin, 3600arcsec"
-    )
+
+    # Fast path for the default "0steps" and other plain integer step counts
+    number = value_str.removesuffix("steps")
+    if number != value_str and number.removeprefix("-").isdecimal():
+        return {"value": float(number), "unit": "STEPS"}
+
+    m = _OFFSET_RE.fullmatch(value_str)
+    if m is None:
+        raise cv.Invalid(_OFFSET_UNIT_ERROR)
+    try:
+        val = float(m['num'])
+    except ValueError:
+        raise cv.Invalid(f"Invalid number for offset: {value}")
+    if not math.isfinite(val):
+        raise cv.Invalid(f"Offset must be a finite number, got {value!r}")
+    return {"value": val, "unit": OFFSET_UNITS[m['unit'].lower()]}
+
+_EXPECTED_PORTS = frozenset(('supply', 'buffer', 'return'))
+_PORT_NUMBERS = frozenset((1, 2, 3))
+_PORTS_MEMBER_ERROR = "The 'ports' mapping must include exactly 'supply', 'buffer', and 'return'."
+_PORTS_UNIQUE_ERROR = "Each port number (1, 2, 3) must be used exactly once."
 
 def validate_ports(value):
     """
@@ -66,15 +105,17 @@ def validate_ports(value):
         return: 3
     """
     # Accept any case for keys, normalize to lowercase
-    key_map = {k.lower(): k for k in value}
-    expected = {'supply', 'buffer', 'return'}
-    if set(key_map) != expected:
-        raise cv.Invalid("The 'ports' mapping must include exactly 'supply', 'buffer', and 'return'.")
-    ports = [int(value[key_map[k]]) for k in expected]
-    if sorted(ports) != [1, 2, 3]:
-        raise cv.Invalid("Each port number (1, 2, 3) must be used exactly once.")
-    # Return mapping in lower-case keys
-    return {k.lower(): int(value[key_map[k]]) for k in expected}
+    ports = {}
+    for key, port in value.items():
+        name = key.lower()
+        if name not in _EXPECTED_PORTS or name in ports:
+            raise cv.Invalid(_PORTS_MEMBER_ERROR)
+        ports[name] = port if type(port) is int else int(port)  # bools go through int() too
+    if len(ports) != 3:
+        raise cv.Invalid(_PORTS_MEMBER_ERROR)
+    if frozenset(ports.values()) != _PORT_NUMBERS:
+        raise cv.Invalid(_PORTS_UNIQUE_ERROR)
+    return ports
 
 def ensure_dict(value):
     if not isinstance(value, dict):
@@ -82,8 +123,8 @@ def ensure_dict(value):
     return value
 
 # Predefined mixer curves for known valve types
-MIXER_CURVES = {
-    'evenes easyflow': [
+MIXER_CURVES = MappingProxyType({
+    'evenes easyflow': (
         (0.0, 0.0),
         (0.1, 0.01),
         (0.2, 0.1),
@@ -95,49 +136,48 @@ MIXER_CURVES = {
         (0.8, 0.9),
         (0.9, 0.99),
         (1.0, 1.0),
-    ],
-    'linear': [
+    ),
+    'linear': (
         (0.0, 0.0),
         (1.0, 1.0),
-    ],
-}
+    ),
+})
 
 def validate_curve_point(value):
     """Validate a single curve point as [flow, position] or {flow: x, position: y} or {x: x, y: y}."""
     if isinstance(value, dict):
         # Support both flow/position and x/y notation
         if 'flow' in value and 'position' in value:
-            flow = cv.float_range(min=0.0, max=1.0)(value['flow'])
-            pos = cv.float_range(min=0.0, max=1.0)(value['position'])
-            return (flow, pos)
+            flow, pos = value['flow'], value['position']
         elif 'x' in value and 'y' in value:
-            flow = cv.float_range(min=0.0, max=1.0)(value['x'])
-            pos = cv.float_range(min=0.0, max=1.0)(value['y'])
-            return (flow, pos)
+            flow, pos = value['x'], value['y']
         else:
             raise cv.Invalid(
                 "Curve point dict must have either 'flow' and 'position' keys or 'x' and 'y' keys"
             )
     elif isinstance(value, list) and len(value) == 2:
-        flow = cv.float_range(min=0.0, max=1.0)(value[0])
-        pos = cv.float_range(min=0.0, max=1.0)(value[1])
-        return (flow, pos)
+        flow, pos = value
     else:
         raise cv.Invalid(
             "Curve point must be a list [flow, position] or dict {flow: x, position: y} or {x: x, y: y}"
         )
+    # Plain floats, so to_code can emit them without further conversion
+    unit_range = cv.float_range(min=0.0, max=1.0)
+    return (float(unit_range(flow)), float(unit_range(pos)))
 
 def validate_mixer_curve(value):
     """Validate mixer curve as predefined type (string) or custom list of points."""
     # If it's a string, check if it's a predefined curve type
     if isinstance(value, str):
-        curve_type = value.lower().strip()
-        if curve_type not in MIXER_CURVES:
+        curve_type = value.strip().lower()
+        points = MIXER_CURVES.get(curve_type)
+        if points is None:
             available = ', '.join([f"'{k}'" for k in MIXER_CURVES.keys()])
             raise cv.Invalid(
                 f"Unknown mixer curve type '{value}'. Available types: {available}"
             )
-        return {'type': curve_type, 'points': MIXER_CURVES[curve_type]}
+        # Fresh result per config so no two configs share mutable state
+        return {'type': curve_type, 'points': list(points)}
     
     # Otherwise, validate as custom curve
     if not isinstance(value, list) or len(value) < 2:
@@ -146,12 +186,13 @@ def validate_mixer_curve(value):
     points = [validate_curve_point(p) for p in value]
     
     # Check that points are sorted by flow value
-    for i in range(len(points) - 1):
-        if points[i][0] >= points[i+1][0]:
-            raise cv.Invalid(
-                f"Mixer curve points must be sorted by flow value. "
-                f"Point {i} (flow={points[i][0]}) >= Point {i+1} (flow={points[i+1][0]})"
-            )
+    if not all(a[0] < b[0] for a, b in zip(points, points[1:])):
+        # Only re-scan to locate the offending pair for the error message
+        i = next(i for i, (a, b) in enumerate(zip(points, points[1:])) if a[0] >= b[0])
+        raise cv.Invalid(
+            f"Mixer curve points must be sorted by flow value. "
+            f"Point {i} (flow={points[i][0]}) >= Point {i+1} (flow={points[i+1][0]})"
+        )
     
     # Check that first point starts at 0.0 and last ends at 1.0
     if points[0][0] != 0.0:
@@ -171,12 +212,35 @@ CONFIG_SCHEMA = valve.valve_schema(ThreeWayValve).extend({
     cv.Optional(CONF_MIXER_CURVE, default='evenes easyflow'): validate_mixer_curve,
 }).extend(cv.COMPONENT_SCHEMA)
 
-ANGLE_MAPPING = {
-    (0, 1, 2): {'open': 270, 'closed': 180, 'blocked': 0},    # supply, buffer, return
-    (0, 2, 1): {'open': 180, 'closed': 270, 'blocked': 0},    # supply, return, buffer
-    (1, 0, 2): {'open': 270, 'closed': 0, 'blocked': 180},    # buffer, supply, return
-    (2, 0, 1): {'open': 0, 'closed': 270, 'blocked': 180},    # return, supply, buffer
-}
+# Port functions -> valve angles as (open, closed, blocked)
+ANGLE_MAPPING = MappingProxyType({
+    (0, 1, 2): (270, 180, 0),    # supply, buffer, return
+    (0, 2, 1): (180, 270, 0),    # supply, return, buffer
+    (1, 0, 2): (270, 0, 180),    # buffer, supply, return
+    (2, 0, 1): (0, 270, 180),    # return, supply, buffer
+})
+
+# ANGLE_MAPPING as a flat lookup table indexed by the packed key f1<<4 | f2<<2 | f3
+_ANGLES_FLAT = [None] * 64
+for _funcs, _angles in ANGLE_MAPPING.items():
+    _ANGLES_FLAT[(_funcs[0] << 4) | (_funcs[1] << 2) | _funcs[2]] = _angles
+del _funcs, _angles
+
+_VALID_LAYOUTS = (
+    "supply: 1, buffer: 2, return: 3",
+    "supply: 1, return: 2, buffer: 3",
+    "buffer: 1, supply: 2, return: 3",
+    "return: 1, supply: 2, buffer: 3",
+)
+_PORT_ERROR_TEMPLATE = (
+    "Invalid port assignment!\n"
+    "  Current: {chosen}\n\n"
+    "  Only assignments where 'open' and 'closed' are 90° apart are supported by this valve.\n"
+    "  In the unsupported assignments, they are 180° apart, making mixing impossible.\n\n"
+    "  Allowed examples:\n"
+    + "\n".join(f"    - {layout}" for layout in _VALID_LAYOUTS)
+    + "\n\nPlease use one of the supported assignments matching your valve's labeling."
+)
 
 async def to_code(config):
     var = cg.new_Pvariable(config[CONF_ID])
@@ -191,36 +255,22 @@ async def to_code(config):
     curve_data = config[CONF_MIXER_CURVE]
     curve_points = curve_data['points']
     
-    # Generate C++ code to set the curve
-    for flow, pos in curve_points:
-        cg.add(var.add_curve_point(flow, pos))
+    # Generate C++ code to set the whole curve in one statement
+    cg.add(var.set_mixer_curve(cg.ArrayInitializer(
+        *[cg.ArrayInitializer(flow, pos) for flow, pos in curve_points]
+    )))
 
     # Ports mapping - always lowercase
     ports_map = config[CONF_PORTS]
-    # Build inverse: port number -> function name
-    inv_map = {v: k for k, v in ports_map.items()}
-    # Function assigned to port 1, 2, 3
-    func_order = [inv_map[i] for i in (1, 2, 3)]  # e.g. ['supply', 'buffer', 'return']
-    funcs_idx = [PORT_FUNCTIONS[f] for f in func_order]
+    # Function index assigned to port 1, 2, 3, e.g. [0, 1, 2] for supply, buffer, return
+    funcs_idx = [0, 0, 0]
+    for name, port in ports_map.items():
+        funcs_idx[port - 1] = PORT_FUNCTIONS[name]
 
-    angles = ANGLE_MAPPING.get(tuple(funcs_idx))
+    angles = _ANGLES_FLAT[(funcs_idx[0] << 4) | (funcs_idx[1] << 2) | funcs_idx[2]]
     if angles is None:
         chosen = ", ".join([f"{k}: {ports_map[k]}" for k in ['supply', 'buffer', 'return']])
-        valid_layouts = [
-            "supply: 1, buffer: 2, return: 3",
-            "supply: 1, return: 2, buffer: 3",
-            "buffer: 1, supply: 2, return: 3",
-            "return: 1, supply: 2, buffer: 3",
-        ]
-        raise cv.Invalid(
-            f"Invalid port assignment!\n"
-            f"  Current: {chosen}\n\n"
-            f"  Only assignments where 'open' and 'closed' are 90° apart are supported by this valve.\n"
-            f"  In the unsupported assignments, they are 180° apart, making mixing impossible.\n\n"
-            f"  Allowed examples:\n"
-            + "\n".join([f"    - {layout}" for layout in valid_layouts])
-            + "\n\nPlease use one of the supported assignments matching your valve's labeling."
-        )
+        raise cv.Invalid(_PORT_ERROR_TEMPLATE.format(chosen=chosen))
 
     # Calculate motor_steps_per_rev - required for offset unit conversion
     if CONF_MOTOR_STEPS_PER_REV not in config:
@@ -244,28 +294,14 @@ async def to_code(config):
     unit = offset_obj["unit"]
     
     # Convert offset to steps based on unit
-    import math
-    if unit == "STEPS":
-        off_steps = int(val)
-    elif unit == "REVOLUTIONS":
-        off_steps = int(val * motor_steps_per_rev * config[CONF_GEAR_RATIO])
-    elif unit == "DEGREES":
-        off_steps = int(val * steps_per_deg)
-    elif unit == "RADIANS":
-        # 1 revolution = 2π radians
-        off_steps = int((val / (2 * math.pi)) * motor_steps_per_rev * config[CONF_GEAR_RATIO])
-    elif unit == "ARCMINUTES":
-        # 21600 arcminutes = 360 degrees
-        off_steps = int((val / 21600.0) * 360.0 * steps_per_deg)
-    elif unit == "ARCSECONDS":
-        # 1296000 arcseconds = 360 degrees
-        off_steps = int((val / 1296000.0) * 360.0 * steps_per_deg)
-    else:
-        raise cv.Invalid(f"Unknown unit type: {unit}")
+    off_steps = int(_OFFSET_TO_STEPS[unit](
+        val, motor_steps_per_rev, config[CONF_GEAR_RATIO], steps_per_deg
+    ))
 
-    cg.add(var.set_pos_closed(int(angles['closed'] * steps_per_deg) + off_steps))
-    cg.add(var.set_pos_open(int(angles['open'] * steps_per_deg) + off_steps))
-    cg.add(var.set_pos_block(int(angles['blocked'] * steps_per_deg) + off_steps))
+    open_angle, closed_angle, blocked_angle = angles
+    cg.add(var.set_pos_closed(int(closed_angle * steps_per_deg) + off_steps))
+    cg.add(var.set_pos_open(int(open_angle * steps_per_deg) + off_steps))
+    cg.add(var.set_pos_block(int(blocked_angle * steps_per_deg) + off_steps))
     cg.add(var.set_pos_all_open(int(180 * steps_per_deg) + off_steps))
 
 # Action schemas
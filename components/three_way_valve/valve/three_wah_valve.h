@@ -38,6 +38,7 @@ namespace esphome
       {
         this->mixer_curve_.push_back({flow, position});
       }
+      void set_mixer_curve(std::vector<CurvePoint> curve) { this->mixer_curve_ = std::move(curve); }
 
       void setup() override {}
 
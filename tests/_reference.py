@@ -0,0 +1,237 @@
+"""Python reference implementations of the C++ curve and valve logic.
+
+The C++ component cannot be exercised from Python without compiling it,
+so the tests run against these ports of three_wah_valve.h and
+three_way_valve.cpp instead. The batch helpers (get_pos_batch_sorted,
+ThreeWayValve.control_valve_batch) have no C++ counterpart; they are
+test-side shortcuts checked against the ported scalar functions.
+"""
+from bisect import bisect_right
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CurvePoint:
+    # Declared by hand: dataclass(slots=True) needs Python 3.10
+    __slots__ = ("x", "y")
+
+    x: float
+    y: float
+
+
+# Reference curve from three_way_valve.h, stored as flat coordinates
+_CURVE_X = (0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+_CURVE_Y = (0.0, 0.01, 0.1, 0.2, 0.3, 0.5, 0.7, 0.8, 0.9, 0.99, 1.0)
+mixer_curve = [CurvePoint(x, y) for x, y in zip(_CURVE_X, _CURVE_Y)]
+
+# Exact curve points, answered without interpolating
+_EXACT_F = dict(zip(_CURVE_X, _CURVE_Y))
+_EXACT_P = dict(zip(_CURVE_Y, _CURVE_X))
+
+# Per-segment slopes for the interpolation fast path
+_SLOPES_FWD = tuple(
+    (y1 - y0) / (x1 - x0)
+    for x0, x1, y0, y1 in zip(_CURVE_X, _CURVE_X[1:], _CURVE_Y, _CURVE_Y[1:])
+)
+_SLOPES_INV = tuple(
+    (x1 - x0) / (y1 - y0)
+    for x0, x1, y0, y1 in zip(_CURVE_X, _CURVE_X[1:], _CURVE_Y, _CURVE_Y[1:])
+)
+
+
+def _interp(v, xs, ys, slopes):
+    """Linearly interpolate v over sorted xs -> ys (like numpy.interp).
+
+    slopes[i] is the precomputed dy/dx of segment i.
+    """
+    if v <= xs[0]:
+        return ys[0]
+    if v >= xs[-1]:
+        return ys[-1]
+    i = bisect_right(xs, v) - 1
+    if i >= len(xs) - 1:
+        # Only NaN gets here: it fails every comparison, and the C++ loop
+        # then falls through to the last curve point
+        return ys[-1]
+    return ys[i] + (v - xs[i]) * slopes[i]
+
+
+def get_flow(x, curve):
+    """
+    Python reference implementation of C++ get_flow template function.
+    Maps position (x) to flow (y) using linear interpolation.
+    """
+    if curve is mixer_curve:
+        y = _EXACT_F.get(x)
+        if y is not None:
+            return y
+        return _interp(x, _CURVE_X, _CURVE_Y, _SLOPES_FWD)
+    if x <= curve[0].x:
+        return curve[0].y
+    if x >= curve[-1].x:
+        return curve[-1].y
+    
+    for p0, p1 in zip(curve, curve[1:]):
+        if p0.x <= x <= p1.x:
+            t = (x - p0.x) / (p1.x - p0.x)
+            return p0.y + t * (p1.y - p0.y)
+    
+    return curve[-1].y
+
+
+def get_pos(y, curve):
+    """
+    Python reference implementation of C++ get_pos template function.
+    Maps flow (y) to position (x) using linear interpolation
+    (inverse of get_flow).
+    """
+    if curve is mixer_curve:
+        x = _EXACT_P.get(y)
+        if x is not None:
+            return x
+        return _interp(y, _CURVE_Y, _CURVE_X, _SLOPES_INV)
+    if y <= curve[0].y:
+        return curve[0].x
+    if y >= curve[-1].y:
+        return curve[-1].x
+    
+    for p0, p1 in zip(curve, curve[1:]):
+        if p0.y <= y <= p1.y:
+            t = (y - p0.y) / (p1.y - p0.y)
+            return p0.x + t * (p1.x - p0.x)
+    
+    return curve[-1].x
+
+
+def get_pos_batch_sorted(flows):
+    """
+    get_pos over mixer_curve for ascending flows in a single sweep.
+    The segment index only moves forward, so no per-value search is needed.
+    """
+    last = len(_CURVE_Y) - 2
+    i = 0
+    positions = []
+    for y in flows:
+        if y <= _CURVE_Y[0]:
+            positions.append(_CURVE_X[0])
+        elif y < _CURVE_Y[-1]:
+            while i < last and _CURVE_Y[i + 1] <= y:
+                i += 1
+            positions.append(_CURVE_X[i] + (y - _CURVE_Y[i]) * _SLOPES_INV[i])
+        else:
+            # Above the curve, or NaN: last point, as in get_pos
+            positions.append(_CURVE_X[-1])
+    return positions
+
+
+class MockStepper:
+    """Mock stepper motor for testing."""
+    __slots__ = ("current_position", "target_position")
+
+    def __init__(self):
+        self.current_position = 0
+        self.target_position = 0
+    
+    def set_target(self, target):
+        self.target_position = int(target)
+
+
+class ThreeWayValve:
+    """Python reference implementation of C++ ThreeWayValve class."""
+    
+    __slots__ = (
+        "stepper_", "pos_closed_", "pos_open_", "pos_block_", "pos_all_open_",
+        "_range_", "_tol_",
+    )
+    
+    def __init__(self):
+        self.stepper_ = None
+        self.pos_closed_ = 0
+        self.pos_open_ = 0
+        self.pos_block_ = 0
+        self.pos_all_open_ = 0
+        self._recompute_cache()
+    
+    def set_stepper(self, stepper):
+        self.stepper_ = stepper
+    
+    def _recompute_cache(self):
+        """
+        Refresh the cached step range and end-stop tolerance when
+        pos_open_/pos_closed_ change.
+        """
+        self._range_ = self.pos_open_ - self.pos_closed_
+        # Tolerance is 0.1% of the range, minimum 1 step
+        self._tol_ = max(int(abs(self._range_) * 0.001), 1)
+    
+    def set_pos_closed(self, p):
+        self.pos_closed_ = int(p)
+        self._recompute_cache()
+    
+    def set_pos_open(self, p):
+        self.pos_open_ = int(p)
+        self._recompute_cache()
+    
+    def set_pos_block(self, p):
+        self.pos_block_ = int(p)
+    
+    def set_pos_all_open(self, p):
+        self.pos_all_open_ = int(p)
+    
+    def control_valve(self, flow):
+        """Control valve based on flow value (0.0 - 1.0)."""
+        # Clamp flow
+        if flow < 0.0:
+            flow = 0.0
+        if flow > 1.0:
+            flow = 1.0
+        
+        # Get position from flow using mixer curve
+        position = get_pos(flow, mixer_curve)
+        
+        # Calculate target step position
+        target = int(self.pos_closed_ + position * self._range_)
+        self.stepper_.set_target(target)
+    
+    def get_valve_state(self):
+        """Get current valve state as flow value (0.0 - 1.0)."""
+        cur = self.stepper_.current_position
+        range_val = self._range_
+        tol = self._tol_
+        
+        # Check if at closed position
+        if abs(cur - self.pos_closed_) < tol:
+            return 0.0
+        
+        # Check if at open position
+        if abs(cur - self.pos_open_) < tol:
+            return 1.0
+        
+        # Calculate position as fraction
+        position = float(cur - self.pos_closed_) / float(range_val)
+        
+        # Clamp position
+        if position < 0.0:
+            position = 0.0
+        elif position > 1.0:
+            position = 1.0
+        
+        # Convert position to flow using mixer curve
+        return get_flow(position, mixer_curve)
+    
+    def control_valve_batch(self, flows):
+        """Return the control_valve target for each flow; the stepper stays."""
+        positions = [
+            _interp(min(max(flow, 0.0), 1.0), _CURVE_Y, _CURVE_X, _SLOPES_INV)
+            for flow in flows
+        ]
+        closed, range_val = self.pos_closed_, self._range_
+        return [int(closed + position * range_val) for position in positions]
+    
+    def park_valve(self):
+        """Move valve to blocked position."""
+        self.stepper_.set_target(self.pos_block_)
+    
+    def open_all_valve(self):
+        """Move valve to all-open position."""
+        self.stepper_.set_target(self.pos_all_open_)
@@ -0,0 +1,12 @@
+"""Shared test setup: keep the ESPHome mocks installed for the session."""
+import pytest
+
+from ._esphome_mocks import install_esphome_mocks, remove_esphome_mocks
+
+
+@pytest.fixture(autouse=True, scope="session")
+def esphome_mocks():
+    """Keep the ESPHome mocks installed for the session and remove them afterwards."""
+    install_esphome_mocks()
+    yield
+    remove_esphome_mocks()
@@ -107,6 +107,25 @@ TEST_F(ValveControlTest, ControlValveVariousFlows)
   }
 }
 
+/**
+ * Test set_mixer_curve replaces the curve in one call
+ */
+TEST_F(ValveControlTest, SetMixerCurveEasyflow)
+{
+  // Without a curve the mapping is linear: 0.25 -> -180 + 0.25 * (-90) = -202
+  valve.control_valve(0.25f);
+  EXPECT_EQ(stepper.target_position, -202);
+
+  // Evenes easyflow points as emitted by to_code
+  valve.set_mixer_curve({{0.0f, 0.0f}, {0.1f, 0.01f}, {0.2f, 0.1f}, {0.3f, 0.2f},
+                         {0.4f, 0.3f}, {0.5f, 0.5f}, {0.6f, 0.7f}, {0.7f, 0.8f},
+                         {0.8f, 0.9f}, {0.9f, 0.99f}, {1.0f, 1.0f}});
+
+  // 0.25 lies halfway between 0.2 and 0.3 -> position 0.35 -> -180 + 0.35 * (-90)
+  valve.control_valve(0.25f);
+  EXPECT_EQ(stepper.target_position, -211);
+}
+
 /**
  * Test get_valve_state at closed position
  */
@@ -1,95 +1,14 @@
 """Tests for Three-Way Valve configuration validation."""
 import pytest
-import sys
-from pathlib import Path
-from types import ModuleType
-
-# Create Invalid exception class that can be raised
-class Invalid(Exception):
-    pass
-
-# Create a proper mock module for config_validation first
-mock_cv = ModuleType('esphome.config_validation')
-mock_cv.Invalid = Invalid
-
-# Add float_range mock
-def mock_float_range(min=None, max=None):
-    def validator(value):
-        v = float(value)
-        if min is not None and v < min:
-            raise Invalid(f"Value {v} is less than minimum {min}")
-        if max is not None and v > max:
-            raise Invalid(f"Value {v} is greater than maximum {max}")
-        return v
-    return validator
-
-def mock_one_of(*values, **kwargs):
-    def validator(value):
-        if kwargs.get('lower'):
-            value = value.lower()
-        if value not in values:
-            raise Invalid(f"Value {value} not in {values}")
-        return value
-    return validator
-
-# Add functions to mock module
-mock_cv.string = lambda value: str(value)
-mock_cv.int_ = lambda value: int(value)
-mock_cv.float_ = lambda value: float(value)
-mock_cv.All = lambda *validators: lambda value: value
-mock_cv.float_range = mock_float_range
-mock_cv.one_of = mock_one_of
-# Add more cv functions needed by the component
-mock_cv.GenerateID = lambda: 'generate_id'
-mock_cv.declare_id = lambda cls: lambda value: value
-mock_cv.use_id = lambda cls: lambda value: value
-mock_cv.Required = lambda key: key
-mock_cv.Optional = lambda key, default=None: key
-mock_cv.COMPONENT_SCHEMA = {}
-mock_cv.Schema = lambda schema: schema  # Schema just returns dict as-is
-
-# Mock ESPHome modules before importing component
-from unittest.mock import MagicMock
-
-# Create the esphome mock module
-mock_esphome = ModuleType('esphome')
-mock_esphome.config_validation = mock_cv  # Make cv accessible as attribute
-mock_esphome.codegen = MagicMock()
-mock_esphome.automation = MagicMock()
-
-# Create components mock
-mock_components = ModuleType('esphome.components')
-mock_components.valve = MagicMock()
-mock_components.stepper = MagicMock()
-mock_esphome.components = mock_components
-
-# Create const mock
-mock_esphome.const = MagicMock()
-
-# Register all mocks in sys.modules
-sys.modules['esphome'] = mock_esphome
-sys.modules['esphome.codegen'] = mock_esphome.codegen
-sys.modules['esphome.config_validation'] = mock_cv
-sys.modules['esphome.components'] = mock_components
-sys.modules['esphome.components.valve'] = mock_components.valve
-sys.modules['esphome.components.stepper'] = mock_components.stepper
-sys.modules['esphome.const'] = mock_esphome.const
-sys.modules['esphome.automation'] = mock_esphome.automation
-
-# Add component path
-sys.path.insert(0, str(Path(__file__).parent.parent / "components" / "three_way_valve" / "valve"))
-
-# Import functions from __init__.py
-import importlib.util
-spec = importlib.util.spec_from_file_location(
-    "three_way_valve_init",
-    Path(__file__).parent.parent / "components" / "three_way_valve" / "valve" / "__init__.py"
-)
-three_way_valve_init = importlib.util.module_from_spec(spec)
-spec.loader.exec_module(three_way_valve_init)
+
+from ._esphome_mocks import load_component, run_to_code
+
+three_way_valve_init = load_component()
+Invalid = three_way_valve_init.cv.Invalid
 
 validate_position_offset = three_way_valve_init.validate_position_offset
 validate_ports = three_way_valve_init.validate_ports
+ensure_dict = three_way_valve_init.ensure_dict
 validate_mixer_curve = three_way_valve_init.validate_mixer_curve
 validate_curve_point = three_way_valve_init.validate_curve_point
 PORT_FUNCTIONS = three_way_valve_init.PORT_FUNCTIONS
@@ -101,193 +20,74 @@ CONF_MIXER_CURVE = three_way_valve_init.CONF_MIXER_CURVE
 class TestValidatePositionOffset:
     """Test suite for validate_position_offset function."""
 
-    # STEPS unit tests
-    def test_valid_steps_positive(self):
-        """Test valid positive steps offset."""
-        result = validate_position_offset("10steps")
-        assert result == {"unit": "STEPS", "value": 10.0}
-
-    def test_valid_steps_negative(self):
-        """Test valid negative steps offset."""
-        result = validate_position_offset("-7steps")
-        assert result == {"unit": "STEPS", "value": -7.0}
-
-    def test_valid_steps_with_spaces(self):
-        """Test valid steps offset with spaces."""
-        result = validate_position_offset("  10 steps  ")
-        assert result == {"unit": "STEPS", "value": 10.0}
-    
-    def test_valid_step_singular(self):
-        """Test 'step' singular form."""
-        result = validate_position_offset("1step")
-        assert result == {"unit": "STEPS", "value": 1.0}
-
-    def test_float_steps(self):
-        """Test fractional steps offset."""
-        result = validate_position_offset("3.14159steps")
-        assert result == {"unit": "STEPS", "value": 3.14159}
-
-    # DEGREES unit tests
-    def test_valid_degrees_positive(self):
-        """Test valid positive degrees offset."""
-        result = validate_position_offset("45.5deg")
-        assert result == {"unit": "DEGREES", "value": 45.5}
-
-    def test_valid_degrees_negative(self):
-        """Test valid negative degrees offset."""
-        result = validate_position_offset("-90deg")
-        assert result == {"unit": "DEGREES", "value": -90.0}
-
-    def test_valid_degree_singular(self):
-        """Test 'degree' singular form."""
-        result = validate_position_offset("1degree")
-        assert result == {"unit": "DEGREES", "value": 1.0}
-
-    def test_valid_degrees_plural(self):
-        """Test 'degrees' plural form."""
-        result = validate_position_offset("180degrees")
-        assert result == {"unit": "DEGREES", "value": 180.0}
-    
-    def test_valid_degrees_symbol(self):
-        """Test degrees with ° symbol."""
-        result = validate_position_offset("90°")
-        assert result == {"unit": "DEGREES", "value": 90.0}
-
-    # REVOLUTIONS unit tests
-    def test_valid_revolutions(self):
-        """Test revolutions unit."""
-        result = validate_position_offset("2.5revolutions")
-        assert result == {"unit": "REVOLUTIONS", "value": 2.5}
-    
-    def test_valid_revolution_singular(self):
-        """Test 'revolution' singular form."""
-        result = validate_position_offset("1revolution")
-        assert result == {"unit": "REVOLUTIONS", "value": 1.0}
-    
-    def test_valid_rev_short(self):
-        """Test 'rev' short form."""
-        result = validate_position_offset("0.5rev")
-        assert result == {"unit": "REVOLUTIONS", "value": 0.5}
-
-    # RADIANS unit tests
-    def test_valid_radians(self):
-        """Test radians unit."""
-        result = validate_position_offset("3.14159radians")
-        assert result == {"unit": "RADIANS", "value": 3.14159}
-    
-    def test_valid_radian_singular(self):
-        """Test 'radian' singular form."""
-        result = validate_position_offset("1radian")
-        assert result == {"unit": "RADIANS", "value": 1.0}
-    
-    def test_valid_rad_short(self):
-        """Test 'rad' short form."""
-        result = validate_position_offset("1.57rad")
-        assert result == {"unit": "RADIANS", "value": 1.57}
-
-    # ARCMINUTES unit tests
-    def test_valid_arcminutes(self):
-        """Test arcminutes unit."""
-        result = validate_position_offset("60arcminutes")
-        assert result == {"unit": "ARCMINUTES", "value": 60.0}
-    
-    def test_valid_arcminute_singular(self):
-        """Test 'arcminute' singular form."""
-        result = validate_position_offset("1arcminute")
-        assert result == {"unit": "ARCMINUTES", "value": 1.0}
-    
-    def test_valid_arcmin_short(self):
-        """Test 'arcmin' short form."""
-        result = validate_position_offset("30arcmin")
-        assert result == {"unit": "ARCMINUTES", "value": 30.0}
-    
-    def test_valid_amin_short(self):
-        """Test 'amin' short form."""
-        result = validate_position_offset("45amin")
-        assert result == {"unit": "ARCMINUTES", "value": 45.0}
-    
-    def test_valid_arcminutes_apostrophe(self):
-        """Test arcminutes with ' symbol."""
-        result = validate_position_offset("90'")
-        assert result == {"unit": "ARCMINUTES", "value": 90.0}
-
-    # ARCSECONDS unit tests
-    def test_valid_arcseconds(self):
-        """Test arcseconds unit."""
-        result = validate_position_offset("3600arcseconds")
-        assert result == {"unit": "ARCSECONDS", "value": 3600.0}
-    
-    def test_valid_arcsecond_singular(self):
-        """Test 'arcsecond' singular form."""
-        result = validate_position_offset("1arcsecond")
-        assert result == {"unit": "ARCSECONDS", "value": 1.0}
-    
-    def test_valid_arcsec_short(self):
-        """Test 'arcsec' short form."""
-        result = validate_position_offset("1800arcsec")
-        assert result == {"unit": "ARCSECONDS", "value": 1800.0}
-    
-    def test_valid_asec_short(self):
-        """Test 'asec' short form."""
-        result = validate_position_offset("900asec")
-        assert result == {"unit": "ARCSECONDS", "value": 900.0}
-    
-    def test_valid_arcseconds_quote(self):
-        """Test arcseconds with \" symbol."""
-        result = validate_position_offset('3600"')
-        assert result == {"unit": "ARCSECONDS", "value": 3600.0}
-
-    # General tests
-    def test_zero_offset(self):
-        """Test zero offset."""
-        result = validate_position_offset("0steps")
-        assert result == {"unit": "STEPS", "value": 0.0}
-
-    def test_invalid_unit(self):
-        """Test invalid unit suffix."""
-        with pytest.raises(Invalid) as excinfo:
-            validate_position_offset("10meters")
-        assert "must end with a valid unit" in str(excinfo.value)
-
-    def test_invalid_number(self):
-        """Test invalid number format."""
-        with pytest.raises(Invalid) as excinfo:
-            validate_position_offset("abcsteps")
-        assert "Invalid number" in str(excinfo.value)
-
-    def test_no_unit(self):
-        """Test offset without unit."""
-        with pytest.raises(Invalid) as excinfo:
-            validate_position_offset("10")
-        assert "must end with a valid unit" in str(excinfo.value)
+    @pytest.mark.parametrize("raw,expected", [
+        # STEPS
+        ("10steps", {"unit": "STEPS", "value": 10.0}),
+        ("-7steps", {"unit": "STEPS", "value": -7.0}),
+        ("  10 steps  ", {"unit": "STEPS", "value": 10.0}),
+        ("1step", {"unit": "STEPS", "value": 1.0}),
+        ("3.14159steps", {"unit": "STEPS", "value": 3.14159}),
+        ("0steps", {"unit": "STEPS", "value": 0.0}),
+        # DEGREES
+        ("45.5deg", {"unit": "DEGREES", "value": 45.5}),
+        ("-90deg", {"unit": "DEGREES", "value": -90.0}),
+        ("1degree", {"unit": "DEGREES", "value": 1.0}),
+        ("180degrees", {"unit": "DEGREES", "value": 180.0}),
+        ("90°", {"unit": "DEGREES", "value": 90.0}),
+        # REVOLUTIONS
+        ("2.5revolutions", {"unit": "REVOLUTIONS", "value": 2.5}),
+        ("1revolution", {"unit": "REVOLUTIONS", "value": 1.0}),
+        ("0.5rev", {"unit": "REVOLUTIONS", "value": 0.5}),
+        # RADIANS
+        ("3.14159radians", {"unit": "RADIANS", "value": 3.14159}),
+        ("1radian", {"unit": "RADIANS", "value": 1.0}),
+        ("1.57rad", {"unit": "RADIANS", "value": 1.57}),
+        # ARCMINUTES
+        ("60arcminutes", {"unit": "ARCMINUTES", "value": 60.0}),
+        ("1arcminute", {"unit": "ARCMINUTES", "value": 1.0}),
+        ("30arcmin", {"unit": "ARCMINUTES", "value": 30.0}),
+        ("45amin", {"unit": "ARCMINUTES", "value": 45.0}),
+        ("90'", {"unit": "ARCMINUTES", "value": 90.0}),
+        # ARCSECONDS
+        ("3600arcseconds", {"unit": "ARCSECONDS", "value": 3600.0}),
+        ("1arcsecond", {"unit": "ARCSECONDS", "value": 1.0}),
+        ("1800arcsec", {"unit": "ARCSECONDS", "value": 1800.0}),
+        ("900asec", {"unit": "ARCSECONDS", "value": 900.0}),
+        ('3600"', {"unit": "ARCSECONDS", "value": 3600.0}),
+        # Case, sign and spacing variants handled by the unit regex
+        ("10STEPS", {"unit": "STEPS", "value": 10.0}),
+        ("45 Deg", {"unit": "DEGREES", "value": 45.0}),
+        ("+5deg", {"unit": "DEGREES", "value": 5.0}),
+        (".5rev", {"unit": "REVOLUTIONS", "value": 0.5}),
+        ("1e3 arcsec", {"unit": "ARCSECONDS", "value": 1000.0}),
+    ])
+    def test_valid_offset(self, raw, expected):
+        """Test valid offsets in every supported unit notation."""
+        assert validate_position_offset(raw) == expected
+
+    @pytest.mark.parametrize("raw,message", [
+        ("10meters", "must end with a valid unit"),  # invalid unit suffix
+        ("abcsteps", "Invalid number"),  # invalid number format
+        ("10", "must end with a valid unit"),  # no unit
+    ])
+    def test_invalid_offset(self, raw, message):
+        """Test invalid offsets raise a descriptive error."""
+        with pytest.raises(Invalid, match=message):
+            validate_position_offset(raw)
 
 
 class TestValidatePorts:
     """Test suite for validate_ports function."""
 
-    def test_valid_ports_123(self):
-        """Test valid port assignment 1-2-3."""
-        ports = {"supply": 1, "buffer": 2, "return": 3}
-        result = validate_ports(ports)
-        assert result == {"supply": 1, "buffer": 2, "return": 3}
-
-    def test_valid_ports_132(self):
-        """Test valid port assignment 1-3-2."""
-        ports = {"supply": 1, "return": 2, "buffer": 3}
-        result = validate_ports(ports)
-        assert result == {"supply": 1, "return": 2, "buffer": 3}
-
-    def test_valid_ports_213(self):
-        """Test valid port assignment 2-1-3."""
-        ports = {"buffer": 1, "supply": 2, "return": 3}
-        result = validate_ports(ports)
-        assert result == {"buffer": 1, "supply": 2, "return": 3}
-
-    def test_valid_ports_312(self):
-        """Test valid port assignment 3-1-2."""
-        ports = {"return": 1, "supply": 2, "buffer": 3}
-        result = validate_ports(ports)
-        assert result == {"return": 1, "supply": 2, "buffer": 3}
+    @pytest.mark.parametrize("ports", [
+        {"supply": 1, "buffer": 2, "return": 3},
+        {"supply": 1, "return": 2, "buffer": 3},
+        {"buffer": 1, "supply": 2, "return": 3},
+        {"return": 1, "supply": 2, "buffer": 3},
+    ], ids=["123", "132", "213", "312"])
+    def test_valid_ports(self, ports):
+        """Test valid port assignments."""
+        assert validate_ports(ports) == ports
 
     def test_case_insensitive_keys(self):
         """Test that port keys are case-insensitive."""
@@ -296,38 +96,35 @@ class TestValidatePorts:
         # Result should be normalized to lowercase
         assert result == {"supply": 1, "buffer": 2, "return": 3}
 
-    def test_missing_port_key(self):
-        """Test missing port key raises error."""
-        ports = {"supply": 1, "buffer": 2}  # Missing 'return'
-        with pytest.raises(Invalid) as excinfo:
-            validate_ports(ports)
-        assert "must include exactly" in str(excinfo.value)
-
-    def test_extra_port_key(self):
-        """Test extra port key raises error."""
-        ports = {"supply": 1, "buffer": 2, "return": 3, "extra": 4}
-        with pytest.raises(Invalid) as excinfo:
-            validate_ports(ports)
-        assert "must include exactly" in str(excinfo.value)
-
-    def test_duplicate_port_numbers(self):
-        """Test duplicate port numbers raise error."""
-        ports = {"supply": 1, "buffer": 1, "return": 3}
-        with pytest.raises(Invalid) as excinfo:
-            validate_ports(ports)
-        assert "must be used exactly once" in str(excinfo.value)
-
-    def test_invalid_port_numbers(self):
-        """Test port numbers other than 1,2,3 raise error."""
-        ports = {"supply": 1, "buffer": 2, "return": 4}
-        with pytest.raises(Invalid) as excinfo:
+    def test_ports_schema_chain(self):
+        """Test the cv.All(ensure_dict, validate_ports) chain used by CONFIG_SCHEMA."""
+        ports_schema = three_way_valve_init.cv.All(ensure_dict, validate_ports)
+        assert ports_schema({"Supply": 1, "buffer": 2, "return": 3}) == \
+            {"supply": 1, "buffer": 2, "return": 3}
+        with pytest.raises(Invalid, match="Must be a mapping"):
+            ports_schema([1, 2, 3])
+
+    @pytest.mark.parametrize("ports,message", [
+        ({"supply": 1, "buffer": 2}, "must include exactly"),  # missing 'return'
+        ({"supply": 1, "buffer": 2, "return": 3, "extra": 4}, "must include exactly"),
+        ({"supply": 1, "buffer": 1, "return": 3}, "must be used exactly once"),  # duplicate
+        ({"supply": 1, "buffer": 2, "return": 4}, "must be used exactly once"),  # not 1,2,3
+        # Keys that collide after lowercasing are rejected, not last-one-wins
+        ({"Supply": 1, "supply": 2, "buffer": 3, "return": 1}, "must include exactly"),
+    ], ids=["missing_key", "extra_key", "duplicate_number", "invalid_number",
+            "case_collision"])
+    def test_invalid_ports(self, ports, message):
+        """Test invalid port mappings raise a descriptive error."""
+        with pytest.raises(Invalid, match=message):
             validate_ports(ports)
-        assert "must be used exactly once" in str(excinfo.value)
 
 
 class TestAngleMapping:
     """Test suite for ANGLE_MAPPING logic."""
 
+    # (config, open, closed, blocked) rows, flattened once for the loops below
+    _ANGLE_TRIPLES = tuple((config, *angles) for config, angles in ANGLE_MAPPING.items())
+
     def test_angle_mapping_exists_for_valid_configs(self):
         """Test that angle mappings exist for all valid port configurations."""
         valid_configs = [
@@ -338,16 +135,13 @@ class TestAngleMapping:
         ]
         for config in valid_configs:
             assert config in ANGLE_MAPPING
-            angles = ANGLE_MAPPING[config]
-            assert "open" in angles
-            assert "closed" in angles
-            assert "blocked" in angles
+            assert len(ANGLE_MAPPING[config]) == 3  # (open, closed, blocked)
 
     def test_angle_mapping_open_closed_90_degrees_apart(self):
         """Test that open and closed positions are 90 degrees apart."""
-        for config, angles in ANGLE_MAPPING.items():
+        for config, open_angle, closed_angle, _ in self._ANGLE_TRIPLES:
             # Calculate the minimum angular difference (accounting for 360° wrap)
-            diff = abs(angles["open"] - angles["closed"])
+            diff = abs(open_angle - closed_angle)
             # Normalize to range [0, 360]
             if diff > 180:
                 diff = 360 - diff
@@ -355,31 +149,34 @@ class TestAngleMapping:
 
     def test_angle_mapping_blocked_positions(self):
         """Test blocked positions are correct (0 or 180)."""
-        for config, angles in ANGLE_MAPPING.items():
-            assert angles["blocked"] in [0, 180], \
-                f"Config {config} has blocked={angles['blocked']}, expected 0 or 180"
+        for config, _, _, blocked_angle in self._ANGLE_TRIPLES:
+            assert blocked_angle in [0, 180], \
+                f"Config {config} has blocked={blocked_angle}, expected 0 or 180"
 
     def test_supply_port_1_configs(self):
         """Test configurations where supply is at port 1."""
         # (0, 1, 2): supply at index 0 -> port 1
-        angles = ANGLE_MAPPING[(0, 1, 2)]
-        assert angles == {"open": 270, "closed": 180, "blocked": 0}
+        assert ANGLE_MAPPING[(0, 1, 2)] == (270, 180, 0)
 
         # (0, 2, 1): supply at index 0 -> port 1
-        angles = ANGLE_MAPPING[(0, 2, 1)]
-        assert angles == {"open": 180, "closed": 270, "blocked": 0}
+        assert ANGLE_MAPPING[(0, 2, 1)] == (180, 270, 0)
 
     def test_buffer_port_1_config(self):
         """Test configuration where buffer is at port 1."""
         # (1, 0, 2): buffer at index 0 -> port 1
-        angles = ANGLE_MAPPING[(1, 0, 2)]
-        assert angles == {"open": 270, "closed": 0, "blocked": 180}
+        assert ANGLE_MAPPING[(1, 0, 2)] == (270, 0, 180)
 
     def test_return_port_1_config(self):
         """Test configuration where return is at port 1."""
         # (2, 0, 1): return at index 0 -> port 1
-        angles = ANGLE_MAPPING[(2, 0, 1)]
-        assert angles == {"open": 0, "closed": 270, "blocked": 180}
+        assert ANGLE_MAPPING[(2, 0, 1)] == (0, 270, 180)
+
+    def test_angle_mapping_is_read_only(self):
+        """Test that ANGLE_MAPPING and MIXER_CURVES cannot be modified."""
+        with pytest.raises(TypeError):
+            ANGLE_MAPPING[(0, 1, 2)] = (0, 0, 0)
+        with pytest.raises(TypeError):
+            MIXER_CURVES['linear'] = ()
 
 
 class TestPortFunctions:
@@ -419,6 +216,13 @@ class TestEdgeCases:
         result = validate_position_offset("1.5e2steps")
         assert result == {"unit": "STEPS", "value": 150.0}
 
+    def test_non_finite_offset(self):
+        """Test that NaN and infinite offsets are rejected at validation time."""
+        for raw in ("nansteps", "infdeg", "-infrev"):
+            with pytest.raises(Invalid) as excinfo:
+                validate_position_offset(raw)
+            assert "finite number" in str(excinfo.value)
+
     def test_ports_as_strings(self):
         """Test ports given as string numbers."""
         ports = {"supply": "1", "buffer": "2", "return": "3"}
@@ -444,14 +248,19 @@ class TestMixerCurveValidation:
         assert len(result['points']) == 2
         assert result['points'] == [(0.0, 0.0), (1.0, 1.0)]
 
-    def test_predefined_curve_case_insensitive(self):
+    @pytest.mark.parametrize("raw", ["LINEAR", "Linear", "  linear  "])
+    def test_predefined_curve_case_insensitive(self, raw):
         """Test that predefined curve types are case insensitive."""
-        result1 = validate_mixer_curve("LINEAR")
-        result2 = validate_mixer_curve("Linear")
-        result3 = validate_mixer_curve("  linear  ")
-        assert result1['type'] == 'linear'
-        assert result2['type'] == 'linear'
-        assert result3['type'] == 'linear'
+        assert validate_mixer_curve(raw)['type'] == 'linear'
+
+    def test_predefined_curve_results_are_independent(self):
+        """Test that mutating one validated curve does not leak into the next."""
+        first = validate_mixer_curve("linear")
+        first['points'].append((0.5, 0.5))
+        first['type'] = 'changed'
+        second = validate_mixer_curve("linear")
+        assert second == {'type': 'linear', 'points': [(0.0, 0.0), (1.0, 1.0)]}
+        assert MIXER_CURVES['linear'] == ((0.0, 0.0), (1.0, 1.0))
 
     def test_unknown_predefined_curve(self):
         """Test that unknown curve type raises error."""
@@ -461,91 +270,34 @@ class TestMixerCurveValidation:
         assert "'evenes easyflow'" in str(exc_info.value)
         assert "'linear'" in str(exc_info.value)
 
-    def test_valid_custom_curve_list_notation(self):
-        """Test valid custom mixer curve with list notation."""
-        curve = [
-            [0.0, 0.0],
-            [0.5, 0.3],
-            [1.0, 1.0]
-        ]
-        result = validate_mixer_curve(curve)
-        assert result['type'] == 'custom'
-        assert result['points'] == [(0.0, 0.0), (0.5, 0.3), (1.0, 1.0)]
-
-    def test_valid_custom_curve_dict_flow_position_notation(self):
-        """Test valid custom curve with dict flow/position notation."""
-        curve = [
-            {'flow': 0.0, 'position': 0.0},
-            {'flow': 0.5, 'position': 0.3},
-            {'flow': 1.0, 'position': 1.0}
-        ]
-        result = validate_mixer_curve(curve)
-        assert result['type'] == 'custom'
-        assert result['points'] == [(0.0, 0.0), (0.5, 0.3), (1.0, 1.0)]
-
-    def test_valid_custom_curve_dict_xy_notation(self):
-        """Test valid custom curve with dict x/y notation."""
-        curve = [
-            {'x': 0.0, 'y': 0.0},
-            {'x': 0.5, 'y': 0.3},
-            {'x': 1.0, 'y': 1.0}
-        ]
+    @pytest.mark.parametrize("curve", [
+        [[0.0, 0.0], [0.5, 0.3], [1.0, 1.0]],
+        [{'flow': 0.0, 'position': 0.0}, {'flow': 0.5, 'position': 0.3},
+         {'flow': 1.0, 'position': 1.0}],
+        [{'x': 0.0, 'y': 0.0}, {'x': 0.5, 'y': 0.3}, {'x': 1.0, 'y': 1.0}],
+    ], ids=["list", "dict_flow_position", "dict_xy"])
+    def test_valid_custom_curve(self, curve):
+        """Test valid custom mixer curves in every supported notation."""
         result = validate_mixer_curve(curve)
         assert result['type'] == 'custom'
         assert result['points'] == [(0.0, 0.0), (0.5, 0.3), (1.0, 1.0)]
 
-    def test_custom_curve_must_have_at_least_two_points(self):
-        """Test that curve with less than 2 points raises error."""
-        with pytest.raises(Invalid) as exc_info:
-            validate_mixer_curve([(0.0, 0.0)])
-        assert "at least 2 points" in str(exc_info.value)
-
-    def test_custom_curve_must_start_at_zero(self):
-        """Test that curve must start at flow=0.0."""
-        curve = [[0.1, 0.0], [1.0, 1.0]]
-        with pytest.raises(Invalid) as exc_info:
-            validate_mixer_curve(curve)
-        assert "start at flow=0.0" in str(exc_info.value)
-
-    def test_custom_curve_must_end_at_one(self):
-        """Test that curve must end at flow=1.0."""
-        curve = [[0.0, 0.0], [0.9, 0.9]]
-        with pytest.raises(Invalid) as exc_info:
-            validate_mixer_curve(curve)
-        assert "end at flow=1.0" in str(exc_info.value)
-
-    def test_custom_curve_points_must_be_sorted(self):
-        """Test that curve points must be sorted by flow value."""
-        curve = [[0.0, 0.0], [1.0, 1.0], [0.5, 0.5]]  # Out of order
-        with pytest.raises(Invalid) as exc_info:
-            validate_mixer_curve(curve)
-        assert "sorted by flow value" in str(exc_info.value)
-
-    def test_custom_curve_duplicate_flow_values(self):
-        """Test that duplicate flow values are rejected."""
-        curve = [[0.0, 0.0], [0.5, 0.3], [0.5, 0.4], [1.0, 1.0]]
-        with pytest.raises(Invalid) as exc_info:
-            validate_mixer_curve(curve)
-        assert "sorted by flow value" in str(exc_info.value)
-
-    def test_custom_curve_flow_values_out_of_range(self):
-        """Test that flow values outside 0-1 range are rejected."""
-        curve = [[0.0, 0.0], [1.5, 0.5]]
-        with pytest.raises(Invalid):
-            validate_mixer_curve(curve)
-
-    def test_custom_curve_position_values_out_of_range(self):
-        """Test that position values outside 0-1 range are rejected."""
-        curve = [[0.0, -0.1], [0.5, 0.5], [1.0, 1.0]]
-        with pytest.raises(Invalid):
-            validate_mixer_curve(curve)
-
-    def test_custom_curve_invalid_point_format(self):
-        """Test that invalid point format is rejected."""
-        curve = [[0.0, 0.0], [0.5], [1.0, 1.0]]  # Second point has only one value
-        with pytest.raises(Invalid) as exc_info:
+    @pytest.mark.parametrize("curve,message", [
+        ([(0.0, 0.0)], "at least 2 points"),
+        ([[0.1, 0.0], [1.0, 1.0]], "start at flow=0.0"),
+        ([[0.0, 0.0], [0.9, 0.9]], "end at flow=1.0"),
+        ([[0.0, 0.0], [1.0, 1.0], [0.5, 0.5]], "sorted by flow value"),  # out of order
+        ([[0.0, 0.0], [0.5, 0.3], [0.5, 0.4], [1.0, 1.0]], "sorted by flow value"),
+        ([[0.0, 0.0], [0.5], [1.0, 1.0]], "must be a list|must have"),  # one-value point
+        ([[0.0, 0.0], [1.5, 0.5]], None),  # flow out of range
+        ([[0.0, -0.1], [0.5, 0.5], [1.0, 1.0]], None),  # position out of range
+    ], ids=["too_few_points", "not_starting_at_zero", "not_ending_at_one", "unsorted",
+            "duplicate_flow", "invalid_point_format", "flow_out_of_range",
+            "position_out_of_range"])
+    def test_invalid_custom_curve(self, curve, message):
+        """Test invalid custom mixer curves are rejected."""
+        with pytest.raises(Invalid, match=message):
             validate_mixer_curve(curve)
-        assert "must be a list" in str(exc_info.value) or "must have" in str(exc_info.value)
 
     def test_predefined_curves_exist(self):
         """Test that predefined mixer curves are properly defined."""
@@ -629,3 +381,51 @@ class TestValveTypeConfiguration:
         assert isinstance(evenes['points'], list)
 
 
+def _to_code_config(**overrides):
+    """Validated config for to_code: ports 1/2/3 = supply/buffer/return."""
+    config = {
+        'id': 'valve_id',
+        'stepper': 'stepper_id',
+        CONF_MIXER_CURVE: validate_mixer_curve('linear'),
+        'ports': {'supply': 1, 'buffer': 2, 'return': 3},
+        'gear_ratio': 3,
+        'motor_steps_per_rev': 200,
+        'position_offset': validate_position_offset('0steps'),
+    }
+    config.update(overrides)
+    return config
+
+
+class TestToCode:
+    """Test suite for the C++ calls generated by to_code."""
+
+    @pytest.mark.parametrize("offset,gear_ratio,expected", [
+        ("10steps", 3, 10),
+        ("0.7rev", 3, 420),
+        ("-5.6rev", 3, -3360),
+        ("1.57rad", 3, 149),
+        ("45deg", 3, -75),
+        ("-280.8arcmin", 5, 13),
+        ("3600arcsec", 3, -1),
+    ])
+    def test_position_offset_steps(self, offset, gear_ratio, expected):
+        """Test that each offset unit converts to the exact step count."""
+        added = run_to_code(three_way_valve_init, _to_code_config(
+            gear_ratio=gear_ratio,
+            position_offset=validate_position_offset(offset),
+        ))
+        # Blocked angle is 0 for this port layout, so the offset is all that remains
+        assert added['set_pos_block'] == (expected,)
+
+    @pytest.mark.parametrize("curve,expected", [
+        ("evenes easyflow", MIXER_CURVES['evenes easyflow']),
+        ([[0.0, 0.0], {'flow': 0.4, 'position': 0.6}, {'x': 1.0, 'y': 1.0}],
+         ((0.0, 0.0), (0.4, 0.6), (1.0, 1.0))),
+    ])
+    def test_mixer_curve_emitted_in_one_call(self, curve, expected):
+        """Test that the whole curve goes out as one set_mixer_curve initializer."""
+        added = run_to_code(three_way_valve_init, _to_code_config(
+            **{CONF_MIXER_CURVE: validate_mixer_curve(curve)}
+        ))
+        assert added['set_mixer_curve'] == (expected,)
+        assert 'add_curve_point' not in added
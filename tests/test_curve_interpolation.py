@@ -1,83 +1,28 @@
 """Tests for curve interpolation functions (get_flow and get_pos)."""
-import sys
-from pathlib import Path
-
-# This test file tests the C++ template functions
-# Since we can't directly test C++ code from Python without compilation,
-# we provide a Python reference implementation and tests for it.
-
-# Python reference implementation matching the C++ template logic
-class CurvePoint:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-
-
-# Reference curve from three_way_valve.h
-mixer_curve = [
-    CurvePoint(0.0, 0.0),
-    CurvePoint(0.1, 0.01),
-    CurvePoint(0.2, 0.1),
-    CurvePoint(0.3, 0.2),
-    CurvePoint(0.4, 0.3),
-    CurvePoint(0.5, 0.5),
-    CurvePoint(0.6, 0.7),
-    CurvePoint(0.7, 0.8),
-    CurvePoint(0.8, 0.9),
-    CurvePoint(0.9, 0.99),
-    CurvePoint(1.0, 1.0),
-]
-
-
-def get_flow(x, curve):
-    """
-    Python reference implementation of C++ get_flow template function.
-    Maps position (x) to flow (y) using linear interpolation.
-    """
-    if x <= curve[0].x:
-        return curve[0].y
-    if x >= curve[-1].x:
-        return curve[-1].y
-    
-    for i in range(len(curve) - 1):
-        x0, x1 = curve[i].x, curve[i + 1].x
-        y0, y1 = curve[i].y, curve[i + 1].y
-        if x0 <= x <= x1:
-            t = (x - x0) / (x1 - x0)
-            return y0 + t * (y1 - y0)
-    
-    return curve[-1].y
-
-
-def get_pos(y, curve):
-    """
-    Python reference implementation of C++ get_pos template function.
-    Maps flow (y) to position (x) using linear interpolation (inverse of get_flow).
-    """
-    if y <= curve[0].y:
-        return curve[0].x
-    if y >= curve[-1].y:
-        return curve[-1].x
-    
-    for i in range(len(curve) - 1):
-        y0, y1 = curve[i].y, curve[i + 1].y
-        x0, x1 = curve[i].x, curve[i + 1].x
-        if y0 <= y <= y1:
-            t = (y - y0) / (y1 - y0)
-            return x0 + t * (x1 - x0)
-    
-    return curve[-1].x
+import pytest
+
+# The C++ template functions are tested through their Python reference
+# implementation in _reference.py.
+from ._reference import (
+    _CURVE_X,
+    _CURVE_Y,
+    CurvePoint,
+    get_flow,
+    get_pos,
+    get_pos_batch_sorted,
+    mixer_curve,
+)
 
 
 class TestGetFlow:
     """Test suite for get_flow function."""
 
-    def test_exact_curve_points(self):
+    @pytest.mark.parametrize("x, y", zip(_CURVE_X, _CURVE_Y))
+    def test_exact_curve_points(self, x, y):
         """Test that exact curve points return exact flow values."""
-        for point in mixer_curve:
-            result = get_flow(point.x, mixer_curve)
-            assert abs(result - point.y) < 1e-6, \
-                f"get_flow({point.x}) = {result}, expected {point.y}"
+        result = get_flow(x, mixer_curve)
+        assert abs(result - y) < 1e-6, \
+            f"get_flow({x}) = {result}, expected {y}"
 
     def test_below_minimum(self):
         """Test position below curve minimum."""
@@ -125,20 +70,19 @@ class TestGetFlow:
         """Test that flow increases monotonically with position."""
         positions = [i * 0.01 for i in range(101)]
         flows = [get_flow(pos, mixer_curve) for pos in positions]
-        for i in range(len(flows) - 1):
-            assert flows[i] <= flows[i + 1], \
-                f"Flow not monotonic at position {positions[i]}"
+        assert all(a <= b for a, b in zip(flows, flows[1:])), \
+            "Flow not monotonic in position"
 
 
 class TestGetPos:
     """Test suite for get_pos function."""
 
-    def test_exact_curve_points(self):
+    @pytest.mark.parametrize("x, y", zip(_CURVE_X, _CURVE_Y))
+    def test_exact_curve_points(self, x, y):
         """Test that exact flow values return exact positions."""
-        for point in mixer_curve:
-            result = get_pos(point.y, mixer_curve)
-            assert abs(result - point.x) < 1e-6, \
-                f"get_pos({point.y}) = {result}, expected {point.x}"
+        result = get_pos(y, mixer_curve)
+        assert abs(result - x) < 1e-6, \
+            f"get_pos({y}) = {result}, expected {x}"
 
     def test_below_minimum(self):
         """Test flow below curve minimum."""
@@ -180,9 +124,16 @@ class TestGetPos:
         """Test that position increases monotonically with flow."""
         flows = [i * 0.01 for i in range(101)]
         positions = [get_pos(flow, mixer_curve) for flow in flows]
-        for i in range(len(positions) - 1):
-            assert positions[i] <= positions[i + 1], \
-                f"Position not monotonic at flow {flows[i]}"
+        assert all(a <= b for a, b in zip(positions, positions[1:])), \
+            "Position not monotonic in flow"
+        # Second sweep over the same ascending batch
+        assert get_pos_batch_sorted(flows) == positions
+
+    def test_batch_sorted_matches_scalar(self):
+        """Test that the sorted batch sweep matches per-value get_pos."""
+        flows = [-0.5] + [i * 0.005 for i in range(201)] + [1.5]
+        expected = [get_pos(flow, mixer_curve) for flow in flows]
+        assert get_pos_batch_sorted(flows) == expected
 
 
 class TestInverseFunctions:
@@ -191,28 +142,25 @@ class TestInverseFunctions:
     def test_round_trip_position_to_flow_to_position(self):
         """Test that pos -> flow -> pos returns original (approximately)."""
         test_positions = [i * 0.1 for i in range(11)]
-        for pos in test_positions:
-            flow = get_flow(pos, mixer_curve)
-            pos_back = get_pos(flow, mixer_curve)
-            assert abs(pos - pos_back) < 1e-5, \
-                f"Round trip failed: {pos} -> {flow} -> {pos_back}"
+        flows = [get_flow(pos, mixer_curve) for pos in test_positions]
+        positions_back = [get_pos(flow, mixer_curve) for flow in flows]
+        assert positions_back == pytest.approx(test_positions, abs=1e-5)
 
     def test_round_trip_flow_to_position_to_flow(self):
         """Test that flow -> pos -> flow returns original (approximately)."""
         test_flows = [i * 0.1 for i in range(11)]
-        for flow in test_flows:
-            pos = get_pos(flow, mixer_curve)
-            flow_back = get_flow(pos, mixer_curve)
-            assert abs(flow - flow_back) < 1e-5, \
-                f"Round trip failed: {flow} -> {pos} -> {flow_back}"
+        positions = [get_pos(flow, mixer_curve) for flow in test_flows]
+        flows_back = [get_flow(pos, mixer_curve) for pos in positions]
+        assert flows_back == pytest.approx(test_flows, abs=1e-5)
 
     def test_round_trip_many_values(self):
         """Test round trip with many intermediate values."""
-        for i in range(101):
-            pos = i * 0.01
-            flow = get_flow(pos, mixer_curve)
-            pos_back = get_pos(flow, mixer_curve)
-            assert abs(pos - pos_back) < 1e-4
+        positions = [i * 0.01 for i in range(101)]
+        flows = [get_flow(pos, mixer_curve) for pos in positions]
+        positions_back = [get_pos(flow, mixer_curve) for flow in flows]
+        assert positions_back == pytest.approx(positions, abs=1e-4)
+        # flows rise with positions, so the sorted sweep applies as well
+        assert get_pos_batch_sorted(flows) == positions_back
 
 
 class TestCurveCharacteristics:
@@ -265,9 +213,18 @@ class TestEdgeCases:
 
     def test_exactly_at_segment_boundary(self):
         """Test values exactly at segment boundaries."""
-        for point in mixer_curve:
-            flow = get_flow(point.x, mixer_curve)
-            assert abs(flow - point.y) < 1e-10
+        flows = [get_flow(x, mixer_curve) for x in _CURVE_X]
+        assert flows == pytest.approx(list(_CURVE_Y), abs=1e-10)
+
+    def test_nan_returns_last_point(self):
+        """Test that NaN falls through to the last curve point like the C++ loop."""
+        nan = float('nan')
+        assert get_flow(nan, mixer_curve) == mixer_curve[-1].y
+        assert get_pos(nan, mixer_curve) == mixer_curve[-1].x
+        assert get_pos_batch_sorted([0.6, nan]) == [get_pos(0.6, mixer_curve), mixer_curve[-1].x]
+        custom_curve = [CurvePoint(0.0, 0.2), CurvePoint(1.0, 0.8)]
+        assert get_flow(nan, custom_curve) == 0.8
+        assert get_pos(nan, custom_curve) == 1.0
 
     def test_single_point_curve(self):
         """Test with minimal curve (single point)."""
@@ -281,8 +238,3 @@ class TestEdgeCases:
         linear_curve = [CurvePoint(0.0, 0.0), CurvePoint(1.0, 1.0)]
         assert get_flow(0.5, linear_curve) == 0.5
         assert get_pos(0.5, linear_curve) == 0.5
-
-
-if __name__ == "__main__":
-    import pytest
-    pytest.main([__file__, "-v"])